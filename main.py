@@ -17,25 +17,30 @@ def _ipv4_only_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
 socket.getaddrinfo = _ipv4_only_getaddrinfo
 
 import asyncio
+import contextlib
+import ctypes
 import gc
+import heapq
 import logging
 import os
-import shutil
+import re
+import struct
 import sys
+import tempfile
 import time
-from datetime import datetime, timezone
+from operator import itemgetter
 
+import ctranslate2
 import discord
+import numpy as np
 import ollama
+import soxr
 from discord.ext import commands
 from dotenv import load_dotenv
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 
 load_dotenv()
 
-_watson_temp_dir = os.getenv("WATSON_TEMP_DIR") or "./temp"
-os.makedirs(_watson_temp_dir, exist_ok=True)
-
 _watson_recordings_dir = os.getenv("WATSON_RECORDINGS_DIR") or "./recordings"
 os.makedirs(_watson_recordings_dir, exist_ok=True)
 
@@ -115,13 +120,13 @@ class _SuppressOpusDecodeFilter(logging.Filter):
 logging.getLogger().addFilter(_SuppressOpusDecodeFilter())
 
 
-def build_transcript_lines(phrases: list[dict]) -> str:
-    """Build raw transcript text from list of {time, user, text}; used by once_done."""
-    lines = []
-    for p in phrases:
-        m, s = divmod(int(p["time"]), 60)
-        lines.append(f"[{m:02d}:{s:02d}] **{p['user']}**: {p['text']}\n")
-    return "".join(lines)
+def build_transcript_lines(phrases: list[tuple[float, str, str]], bold: bool = True) -> str:
+    """Build raw transcript text from (time, user, text) tuples; bold=False omits the ** markup."""
+    mark = "**" if bold else ""
+    return "".join(
+        f"[{t // 60:02d}:{t % 60:02d}] {mark}{user}{mark}: {text}\n"
+        for t, user, text in ((int(start), user, text) for start, user, text in phrases)
+    )
 
 
 logging.getLogger("discord.voicereader").setLevel(logging.ERROR)
@@ -138,12 +143,19 @@ _OPUS_FALLBACK_PATHS = [
 
 def _load_opus() -> None:
     """Load Opus library from OPUS_LIB_PATH or fallback paths. Required for voice."""
+    if discord.opus.is_loaded():
+        return
     explicit = os.getenv("OPUS_LIB_PATH")
     if explicit:
         paths = [explicit]
     else:
         paths = _OPUS_FALLBACK_PATHS
     for path in paths:
+        # Absolute paths that are not there would only fail inside dlopen; bare names
+        # like libopus.so.0 go through the loader's search path.
+        if os.path.isabs(path) and not os.path.exists(path):
+            logger.debug("Opus not found at %s", path)
+            continue
         try:
             discord.opus.load_opus(path)
             logger.info("Opus loaded: %s", path)
@@ -158,13 +170,39 @@ def _load_opus() -> None:
 
 _load_opus()
 
+
+def _resolve_whisper_device() -> tuple[str, str]:
+    """
+    Resolve WHISPER_DEVICE and WHISPER_COMPUTE_TYPE. Device "auto" (default) picks CUDA when
+    CTranslate2 sees a GPU. Without an explicit compute type: int8_float16 on GPUs that
+    support it (SM >= 7.5), else float16 on CUDA; int8 on CPU.
+    """
+    device = (os.getenv("WHISPER_DEVICE") or "auto").strip().lower()
+    if device == "auto":
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    compute = (os.getenv("WHISPER_COMPUTE_TYPE") or "").strip()
+    if not compute:
+        if device == "cuda":
+            supported = ctranslate2.get_supported_compute_types("cuda")
+            compute = "int8_float16" if "int8_float16" in supported else "float16"
+        else:
+            compute = "int8"
+    return device, compute
+
+
+WHISPER_SAMPLE_RATE = 16000
 _whisper_model = os.getenv("WHISPER_MODEL", "turbo")
-_whisper_device = os.getenv("WHISPER_DEVICE", "cpu")
-_whisper_compute = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
-logger.info("Loading Whisper model (%s)...", _whisper_model)
-model = WhisperModel(_whisper_model, device=_whisper_device, compute_type=_whisper_compute)
-logger.info("Whisper ready")
-logger.info("Temp dir (cleared after each transcription): %s", _watson_temp_dir)
+_whisper_device, _whisper_compute = _resolve_whisper_device()
+_whisper_num_workers = max(1, int(os.getenv("WHISPER_NUM_WORKERS", "2")))
+_whisper_cpu_threads = int(
+    os.getenv("WHISPER_CPU_THREADS")
+    or max(1, (os.cpu_count() or 1) // _whisper_num_workers)
+)
+_whisper_gpu_count = (
+    max(1, ctranslate2.get_cuda_device_count()) if _whisper_device == "cuda" else 1
+)
+_whisper_device_index = list(range(_whisper_gpu_count)) if _whisper_gpu_count > 1 else 0
+_whisper_parallel_calls = _whisper_num_workers * _whisper_gpu_count
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -182,41 +220,231 @@ WARNING_BEFORE_STOP_SECONDS = WARNING_BEFORE_STOP_MINUTES * 60
 
 _transcript_lang = (os.getenv("TRANSCRIPT_LANGUAGE") or "").strip()
 TRANSCRIPT_LANGUAGE = _transcript_lang or None
-TRANSCRIPT_BEAM_SIZE = int(os.getenv("TRANSCRIPT_BEAM_SIZE", "5"))
+TRANSCRIPT_BEAM_SIZE = int(os.getenv("TRANSCRIPT_BEAM_SIZE", "1"))
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "8"))
+TRANSCRIPT_VAD_PARAMETERS = {
+    "min_silence_duration_ms": int(os.getenv("TRANSCRIPT_VAD_MIN_SILENCE_MS", "500")),
+    "threshold": float(os.getenv("TRANSCRIPT_VAD_THRESHOLD", "0.5")),
+}
+# Peak, not RMS: silence padding pulls an idle speaker's mean toward zero.
+TRANSCRIPT_MIN_PEAK = int(os.getenv("TRANSCRIPT_MIN_PEAK", "300"))
+TRANSCRIPT_MIN_SECONDS = float(os.getenv("TRANSCRIPT_MIN_SECONDS", "0.5"))
+# No previous-text conditioning, so a hallucination on a quiet track cannot repeat down the track.
+_TRANSCRIBE_OPTIONS = {
+    "beam_size": TRANSCRIPT_BEAM_SIZE,
+    "best_of": 1,
+    "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+    "compression_ratio_threshold": 2.4,
+    "log_prob_threshold": -1.0,
+    "no_speech_threshold": 0.6,
+    "condition_on_previous_text": False,
+    "language": TRANSCRIPT_LANGUAGE,
+    "vad_filter": True,
+    "vad_parameters": TRANSCRIPT_VAD_PARAMETERS,
+}
+
+WHISPER_IDLE_UNLOAD_SECONDS = float(os.getenv("WHISPER_IDLE_UNLOAD_SECONDS") or 0)
+model: WhisperModel | None = None
+batched_model: BatchedInferencePipeline | None = None
+_whisper_load_lock = asyncio.Lock()
+_whisper_sessions = 0
+_whisper_unload_handle: asyncio.TimerHandle | None = None
+_whisper_slots = asyncio.Semaphore(_whisper_parallel_calls)
+_decode_slots = asyncio.Semaphore(2 * _whisper_parallel_calls)
+
+
+def _load_whisper_model() -> None:
+    """Load the Whisper model (and the batched pipeline if TRANSCRIPT_BATCH_SIZE > 1)."""
+    global model, batched_model
+    logger.info(
+        "Loading Whisper model (%s) on %s/%s (device_index=%s), cpu_threads=%d, num_workers=%d...",
+        _whisper_model,
+        _whisper_device,
+        _whisper_compute,
+        _whisper_device_index,
+        _whisper_cpu_threads,
+        _whisper_num_workers,
+    )
+    model = WhisperModel(
+        _whisper_model,
+        device=_whisper_device,
+        device_index=_whisper_device_index,
+        compute_type=_whisper_compute,
+        cpu_threads=_whisper_cpu_threads,
+        num_workers=_whisper_num_workers,
+    )
+    batched_model = (
+        BatchedInferencePipeline(model=model) if TRANSCRIPT_BATCH_SIZE > 1 else None
+    )
+    logger.info("Whisper ready")
+
+
+def _unload_whisper_model() -> None:
+    """Drop the model if no session started using it since the unload was scheduled."""
+    global model, batched_model, _whisper_unload_handle
+    _whisper_unload_handle = None
+    if _whisper_sessions or model is None:
+        return
+    model = batched_model = None
+    if _malloc_trim is not None:
+        asyncio.get_running_loop().run_in_executor(None, _malloc_trim, 0)
+    logger.info("Whisper model unloaded after %.0f s idle", WHISPER_IDLE_UNLOAD_SECONDS)
+
+
+@contextlib.asynccontextmanager
+async def _whisper_in_use():
+    """
+    Hold the Whisper model for one session: load it if needed (off the event loop) and,
+    with WHISPER_IDLE_UNLOAD_SECONDS set, schedule an unload once the last session is done.
+    """
+    global _whisper_sessions, _whisper_unload_handle
+    if _whisper_unload_handle is not None:
+        _whisper_unload_handle.cancel()
+        _whisper_unload_handle = None
+    _whisper_sessions += 1
+    try:
+        async with _whisper_load_lock:
+            if model is None:
+                await asyncio.to_thread(_load_whisper_model)
+        yield
+    finally:
+        _whisper_sessions -= 1
+        if WHISPER_IDLE_UNLOAD_SECONDS and not _whisper_sessions:
+            _whisper_unload_handle = asyncio.get_running_loop().call_later(
+                WHISPER_IDLE_UNLOAD_SECONDS, _unload_whisper_model
+            )
+
+
+def _warm_up_whisper() -> None:
+    """
+    Transcribe one second of silence so CTranslate2's first-call allocations happen at startup,
+    not during the first recording. VAD is off, otherwise the silence never reaches the encoder.
+    """
+    started = time.monotonic()
+    try:
+        segments, _ = model.transcribe(
+            np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32),
+            language=TRANSCRIPT_LANGUAGE or "en",
+            beam_size=1,
+            vad_filter=False,
+            without_timestamps=True,
+        )
+        for _ in segments:
+            pass
+    except Exception as e:
+        logger.warning("Whisper warm-up failed (first recording will be slower): %s", e)
+        return
+    logger.info("Whisper warm-up done in %.1f s", time.monotonic() - started)
+
+
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "1").strip().lower() not in ("0", "false", "no")
+
+if not WHISPER_IDLE_UNLOAD_SECONDS:
+    _load_whisper_model()
+    if WHISPER_WARMUP:
+        _warm_up_whisper()
 
 _default_junk = "editor|subtitles|thanks for watching|to be continued"
 TRANSCRIPT_JUNK_PHRASES = [
     p.strip() for p in os.getenv("TRANSCRIPT_JUNK_PHRASES", _default_junk).split("|") if p.strip()
 ]
+_JUNK_RE = (
+    re.compile("|".join(map(re.escape, TRANSCRIPT_JUNK_PHRASES)), re.IGNORECASE)
+    if TRANSCRIPT_JUNK_PHRASES
+    else None
+)
+
+
+def is_junk_text(text: str) -> bool:
+    """True if a segment is too short or contains one of TRANSCRIPT_JUNK_PHRASES."""
+    return len(text) <= 1 or (_JUNK_RE is not None and _JUNK_RE.search(text) is not None)
+
 
 OLLAMA_RECAP_MODEL = (os.getenv("OLLAMA_RECAP_MODEL") or "").strip() or None
 _recap_prompt_file = os.getenv("RECAP_PROMPT_FILE") or os.path.join(
     os.path.dirname(os.path.abspath(__file__)), "prompts", "recap.txt"
 )
 RECAP_MAX_CHARS = 400
+_RECAP_OPTIONS = {"num_predict": 160, "temperature": 0.3, "num_ctx": 4096}
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "10m")
+WATSON_RELOAD_PROMPT = os.getenv("WATSON_RELOAD_PROMPT", "").strip().lower() in ("1", "true", "yes")
 
 OLLAMA_RETRIES = 3
 OLLAMA_RETRY_DELAY = 2.0
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT") or 120)
+_ollama_client = (
+    ollama.Client(host=OLLAMA_HOST, timeout=OLLAMA_TIMEOUT) if OLLAMA_RECAP_MODEL else None
+)
+
+WATSON_GC_THRESHOLD_MB = float(os.getenv("WATSON_GC_THRESHOLD_MB") or 0)
+gc.set_threshold(50000, 20, 20)
+
+
+_STATM_PATH = "/proc/self/statm"
+_process = None
+if not os.path.exists(_STATM_PATH):
+    try:
+        import psutil
+
+        _process = psutil.Process()
+    except ImportError:
+        pass
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _memory_mb() -> float | None:
+    """Resident set size of this process in MB, or None if it cannot be read."""
+    try:
+        if _process is None:
+            with open(_STATM_PATH, "rb") as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+        return _process.memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _load_malloc_trim():
+    """glibc's malloc_trim, or None where it is not available (macOS, musl, Windows)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return ctypes.CDLL("libc.so.6").malloc_trim
+    except (OSError, AttributeError):
+        return None
+
+
+_malloc_trim = _load_malloc_trim()
+
+
+def _log_memory(stage: str) -> None:
+    """Log RSS at a processing stage; skips reading it when INFO is not logged."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    mb = _memory_mb()
+    if mb is not None:
+        logger.info("Memory [%s]: %.0f MB", stage, mb)
+
+
+WATSON_STRICT_WRITE_CHECK = os.getenv("WATSON_STRICT_WRITE_CHECK", "").strip().lower() in ("1", "true", "yes")
 
 
 def _check_environment() -> None:
     """
-    Verify temp and recordings dirs are writable; if recap is enabled, verify Ollama is reachable.
+    Verify the recordings dir is writable; if recap is enabled, verify Ollama is reachable.
     Exits with a clear message on failure.
     """
-    for name, path in [
-        ("WATSON_TEMP_DIR", _watson_temp_dir),
-        ("WATSON_RECORDINGS_DIR", _watson_recordings_dir),
-    ]:
-        try:
-            os.makedirs(path, exist_ok=True)
-            test_file = os.path.join(path, ".watson_write_test")
-            with open(test_file, "w") as f:
-                f.write("")
-            os.remove(test_file)
-        except OSError as e:
-            logger.error("%s is not writable: %s — %s", name, path, e)
-            sys.exit(1)
+    path = _watson_recordings_dir
+    try:
+        os.makedirs(path, exist_ok=True)
+        # os.access passes for root (the Docker default) and can miss NFS root_squash or
+        # server-side ACLs; the probe file catches those.
+        if WATSON_STRICT_WRITE_CHECK or not os.access(path, os.W_OK):
+            with tempfile.NamedTemporaryFile(dir=path, prefix=".watson_write_test"):
+                pass
+    except OSError as e:
+        logger.error("WATSON_RECORDINGS_DIR is not writable: %s — %s", path, e)
+        sys.exit(1)
     if OLLAMA_RECAP_MODEL:
         if not os.path.isfile(_recap_prompt_file):
             logger.error(
@@ -224,14 +452,12 @@ def _check_environment() -> None:
                 _recap_prompt_file,
             )
             sys.exit(1)
-        ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
         try:
-            client = ollama.Client(host=ollama_host)
-            client.list()
+            _ollama_client.list()
         except Exception as e:
             logger.error(
                 "Ollama is not reachable at %s (OLLAMA_RECAP_MODEL=%s): %s",
-                ollama_host,
+                OLLAMA_HOST,
                 OLLAMA_RECAP_MODEL,
                 e,
             )
@@ -243,6 +469,46 @@ if not os.getenv("WATSON_SKIP_ENV_CHECK"):
     _check_environment()
 
 
+_TRANSCRIPT_PLACEHOLDER = "{{TRANSCRIPT}}"
+
+
+def _load_recap_prompt() -> tuple[tuple[str, str] | None, float | None]:
+    """
+    Read the recap prompt file and split it around {{TRANSCRIPT}}.
+    Returns ((prefix, suffix), mtime); (None, None) if it cannot be read.
+    Without a placeholder the transcript is appended after the template.
+    """
+    try:
+        mtime = os.stat(_recap_prompt_file).st_mtime
+        with open(_recap_prompt_file, "r", encoding="utf-8") as f:
+            template = f.read()
+    except OSError as e:
+        logger.warning("Could not read recap prompt %s: %s", _recap_prompt_file, e)
+        return None, None
+    prefix, sep, suffix = template.partition(_TRANSCRIPT_PLACEHOLDER)
+    if not sep:
+        logger.warning("Recap prompt has no %s placeholder: %s", _TRANSCRIPT_PLACEHOLDER, _recap_prompt_file)
+    return (prefix, suffix), mtime
+
+
+_recap_prompt_parts, _recap_prompt_mtime = (
+    _load_recap_prompt() if OLLAMA_RECAP_MODEL else (None, None)
+)
+
+
+def _current_recap_prompt() -> tuple[str, str] | None:
+    """Cached (prefix, suffix) of the recap prompt; re-read on mtime change if WATSON_RELOAD_PROMPT."""
+    global _recap_prompt_parts, _recap_prompt_mtime
+    if WATSON_RELOAD_PROMPT:
+        try:
+            mtime = os.stat(_recap_prompt_file).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != _recap_prompt_mtime:
+            _recap_prompt_parts, _recap_prompt_mtime = _load_recap_prompt()
+    return _recap_prompt_parts
+
+
 async def on_ready() -> None:
     """Log bot name, ID, and guild count when the bot comes online."""
     assert bot is not None
@@ -293,6 +559,18 @@ async def on_voice_state_update(member, before, after) -> None:
     )
 
 
+_CHECK_STATUS_TEMPLATE = "\n".join(
+    [
+        "✅ **Connection:** OK",
+        "🎤 **Voice channel:** {voice}",
+        "📝 **Send messages:** {send}",
+        "📎 **Attach files:** {attach}",
+        "📜 **Read history:** {history}",
+        "🎙 **Speak:** {speak}",
+    ]
+)
+
+
 async def check(ctx) -> None:
     """Reply with connection status and bot permissions in the current channel."""
     logger.info(
@@ -303,17 +581,17 @@ async def check(ctx) -> None:
         ctx.guild.id,
     )
     perms = ctx.channel.permissions_for(ctx.me)
-    status = [
-        f"✅ **Connection:** OK",
-        f"🎤 **Voice channel:** {'✅' if ctx.author.voice else '❌ (you are not in a channel)'}",
-        f"📝 **Send messages:** {'✅' if perms.send_messages else '❌'}",
-        f"📎 **Attach files:** {'✅' if perms.attach_files else '❌'}",
-        f"📜 **Read history:** {'✅' if perms.read_message_history else '❌'}",
-        f"🎙 **Speak:** {'✅' if perms.speak else '❌'}",
-    ]
     embed = discord.Embed(
         title="Watson system check",
-        description="\n".join(status),
+        description=_CHECK_STATUS_TEMPLATE.format_map(
+            {
+                "voice": "✅" if ctx.author.voice else "❌ (you are not in a channel)",
+                "send": "✅" if perms.send_messages else "❌",
+                "attach": "✅" if perms.attach_files else "❌",
+                "history": "✅" if perms.read_message_history else "❌",
+                "speak": "✅" if perms.speak else "❌",
+            }
+        ),
         color=discord.Color.blue() if perms.attach_files else discord.Color.red(),
     )
     await ctx.send(embed=embed)
@@ -467,7 +745,7 @@ async def record(ctx) -> None:
         MAX_RECORDING_MINUTES,
     )
     await ctx.send(f"⏺ **Recording started.** (max {MAX_RECORDING_MINUTES} min)")
-    voice.start_recording(discord.sinks.WaveSink(), once_done, ctx.channel)
+    voice.start_recording(WhisperSink(), once_done, ctx.channel)
     asyncio.create_task(_enforce_recording_limit(ctx.guild.id, ctx.channel.id))
 
 
@@ -501,6 +779,39 @@ async def leave(ctx) -> None:
         await ctx.send("I'm not in a voice channel.")
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    Rough LLM token count, assuming about 4 UTF-8 bytes per token. Counting bytes rather than
+    characters weighs Cyrillic (2 bytes) and CJK (3 bytes) text more heavily than len() // 4 would.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def fit_transcript_to_tokens(transcript: str, max_tokens: int) -> str:
+    """
+    Keep whole transcript lines within max_tokens: the opening third and the closing
+    two thirds of the budget (intro and conclusions), with a marker where lines were dropped.
+    """
+    if estimate_tokens(transcript) <= max_tokens:
+        return transcript
+    lines = transcript.splitlines(keepends=True)
+    head_budget = max_tokens // 3
+    tail_budget = max_tokens - head_budget
+    head, used = 0, 0
+    for line in lines:
+        used += estimate_tokens(line)
+        if used > head_budget:
+            break
+        head += 1
+    tail, used = 0, 0
+    for line in reversed(lines[head:]):
+        used += estimate_tokens(line)
+        if used > tail_budget:
+            break
+        tail += 1
+    return "".join(lines[:head]) + "\n[...]\n\n" + "".join(lines[len(lines) - tail :])
+
+
 def _get_recap_sync(transcript: str) -> str | None:
     """
     Generate a short recap via Ollama with retries.
@@ -508,31 +819,43 @@ def _get_recap_sync(transcript: str) -> str | None:
     """
     if not OLLAMA_RECAP_MODEL:
         return None
-    if not os.path.isfile(_recap_prompt_file):
-        logger.warning("Recap prompt file not found: %s", _recap_prompt_file)
-        return None
-    try:
-        with open(_recap_prompt_file, "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-    except OSError as e:
-        logger.warning("Could not read recap prompt: %s", e)
+    prompt_parts = _current_recap_prompt()
+    if prompt_parts is None:
         return None
-    prompt = prompt_template.replace("{{TRANSCRIPT}}", transcript)
-    if len(prompt) > 12000:
-        prompt = prompt[:12000] + "\n\n[truncated]"
-    client = ollama.Client(host=os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+    prefix, suffix = prompt_parts
+    budget = (
+        _RECAP_OPTIONS["num_ctx"]
+        - _RECAP_OPTIONS["num_predict"]
+        - estimate_tokens(prefix)
+        - estimate_tokens(suffix)
+    )
+    prompt = f"{prefix}{fit_transcript_to_tokens(transcript, budget)}{suffix}"
     last_error = None
     for attempt in range(OLLAMA_RETRIES):
         try:
-            response = client.chat(
-                model=OLLAMA_RECAP_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            text = (response.get("message") or {}).get("content") or ""
-            text = text.strip()
+            parts = []
+            received = 0
+            truncated = False
+            with contextlib.closing(
+                _ollama_client.chat(
+                    model=OLLAMA_RECAP_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    options=_RECAP_OPTIONS,
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                )
+            ) as stream:
+                for chunk in stream:
+                    piece = (chunk.get("message") or {}).get("content") or ""
+                    parts.append(piece)
+                    received += len(piece)
+                    if received >= RECAP_MAX_CHARS:
+                        truncated = True
+                        break
+            text = "".join(parts).strip()
             if not text:
                 return None
-            if len(text) > RECAP_MAX_CHARS:
+            if truncated or len(text) > RECAP_MAX_CHARS:
                 text = text[: RECAP_MAX_CHARS - 3].rstrip() + "..."
             return text
         except Exception as e:
@@ -550,6 +873,214 @@ def _get_recap_sync(transcript: str) -> str | None:
     return None
 
 
+_UNSAFE_NAME_RE = re.compile(r"[^\w-]")
+
+
+def safe_filename_part(name: str) -> str:
+    """Replace every character other than letters, digits, '-' and '_' with '_'."""
+    return _UNSAFE_NAME_RE.sub("_", name)
+
+
+def _write_file(path: str, data) -> None:
+    """Write bytes (or a memoryview) to path."""
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+WATSON_RECORDING_FORMAT = (os.getenv("WATSON_RECORDING_FORMAT") or "wav").strip().lower()
+soundfile = None
+if WATSON_RECORDING_FORMAT == "flac":
+    try:
+        import soundfile
+    except ImportError:
+        logger.warning("WATSON_RECORDING_FORMAT=flac needs the soundfile package; saving WAV")
+        WATSON_RECORDING_FORMAT = "wav"
+elif WATSON_RECORDING_FORMAT != "wav":
+    logger.warning("Unknown WATSON_RECORDING_FORMAT %r; saving WAV", WATSON_RECORDING_FORMAT)
+    WATSON_RECORDING_FORMAT = "wav"
+
+
+def _save_recording(dest: str, wav) -> str | None:
+    """
+    Save one user's recording to dest from the in-memory WAV bytes, as-is or encoded to FLAC.
+    The file is written as dest + ".part" and renamed into place, so a failed write never
+    leaves a truncated recording under the final name. Returns dest on success, None on failure (logged).
+    """
+    part = dest + ".part"
+    try:
+        if WATSON_RECORDING_FORMAT == "flac":
+            channels, sample_rate = struct.unpack_from("<HI", wav, 22)
+            num_samples = (len(wav) - _WAV_HEADER_SIZE) // 2
+            pcm = np.frombuffer(
+                wav, dtype=np.int16, count=num_samples, offset=_WAV_HEADER_SIZE
+            )
+            soundfile.write(
+                part, pcm.reshape(-1, channels), sample_rate, format="FLAC", subtype="PCM_16"
+            )
+        else:
+            _write_file(part, wav)
+        os.replace(part, dest)
+        return dest
+    # soundfile raises LibsndfileError (a RuntimeError); a malformed header fails the reshape.
+    except (OSError, RuntimeError, ValueError) as e:
+        logger.warning("Could not save recording to %s: %s", dest, e)
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        return None
+
+
+def _save_transcript(path: str, parts: list[str]) -> bool:
+    """Write the transcript file from parts (no joined copy); logs and returns False on failure."""
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(parts)
+        logger.debug("Saved transcript to %s", path)
+        return True
+    except OSError as e:
+        logger.warning("Could not save transcript to %s: %s", path, e)
+        return False
+
+
+_WAV_HEADER_SIZE = 44
+
+
+def wav_duration_seconds(wav) -> float:
+    """Length of 16-bit PCM WAV bytes in seconds, from the fmt fields (0.0 if there is no header)."""
+    if len(wav) < _WAV_HEADER_SIZE:
+        return 0.0
+    channels, sample_rate = struct.unpack_from("<HI", wav, 22)
+    if not channels or not sample_rate:
+        return 0.0
+    return (len(wav) - _WAV_HEADER_SIZE) / (2 * channels * sample_rate)
+
+
+def wav_to_whisper_audio(wav) -> np.ndarray:
+    """
+    Decode 16-bit PCM WAV bytes (as produced by WaveSink) into float32 mono at 16 kHz.
+    WaveSink writes its header over the start of the buffer with a zero data size, so the
+    format comes from the fmt fields and everything after the 44-byte header is PCM.
+    WhisperSink output is already 16 kHz mono and only gets scaled to float.
+    """
+    channels, sample_rate = struct.unpack_from("<HI", wav, 22)
+    (bits_per_sample,) = struct.unpack_from("<H", wav, 34)
+    if bits_per_sample != 16:
+        raise ValueError(f"Unsupported WAV sample width: {bits_per_sample} bits")
+    frame_size = 2 * channels
+    num_frames = (len(wav) - _WAV_HEADER_SIZE) // frame_size
+    pcm = np.frombuffer(
+        wav, dtype=np.int16, count=num_frames * channels, offset=_WAV_HEADER_SIZE
+    )
+    if channels == 1:
+        audio = pcm.astype(np.float32)
+        audio /= 32768.0
+    else:
+        audio = pcm.reshape(-1, channels).mean(axis=1, dtype=np.float32) / 32768.0
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        audio = soxr.resample(audio, sample_rate, WHISPER_SAMPLE_RATE)
+    return audio
+
+
+_DISCORD_SAMPLE_RATE = 48000
+
+
+class WhisperSink(discord.sinks.WaveSink):
+    """
+    WaveSink that stores each user's audio as 16 kHz mono while recording: Discord's 48 kHz
+    stereo is downmixed and resampled per packet (silence padding included, so timing holds).
+    Tracks are 6x smaller in memory and already in Whisper's format when the session ends.
+    """
+
+    def __init__(self, *, filters=None):
+        super().__init__(filters=filters)
+        self._resamplers: dict[int, soxr.ResampleStream] = {}
+
+    def write(self, data, user):
+        """Called from the decoder thread with 48 kHz stereo s16le PCM for one user."""
+        stream = self._resamplers.get(user)
+        if stream is None:
+            stream = self._resamplers[user] = soxr.ResampleStream(
+                _DISCORD_SAMPLE_RATE, WHISPER_SAMPLE_RATE, 1, dtype="int16"
+            )
+            # Reserve the header so format_audio does not overwrite the first samples.
+            super().write(bytes(_WAV_HEADER_SIZE), user)
+        stereo = np.frombuffer(data, dtype=np.int16).reshape(-1, 2)
+        mono = ((stereo[:, 0].astype(np.int32) + stereo[:, 1]) >> 1).astype(np.int16)
+        super().write(stream.resample_chunk(mono), user)
+
+    def cleanup(self):
+        """Flush the resamplers' buffered tail before the tracks are finalized."""
+        for user, stream in self._resamplers.items():
+            tail = stream.resample_chunk(np.empty(0, dtype=np.int16), last=True)
+            self.audio_data[user].write(tail)
+        self._resamplers.clear()
+        super().cleanup()
+
+    def format_audio(self, audio):
+        """Fill the reserved header with a complete 16 kHz mono 16-bit WAV header."""
+        if self.vc is not None and self.vc.recording:
+            raise discord.sinks.WaveSinkError(
+                "Audio may only be formatted after recording is finished."
+            )
+        data = audio.file
+        data_size = data.seek(0, os.SEEK_END) - _WAV_HEADER_SIZE
+        data.seek(0)
+        data.write(
+            struct.pack(
+                "<4sI4s4sIHHIIHH4sI",
+                b"RIFF",
+                36 + data_size,
+                b"WAVE",
+                b"fmt ",
+                16,
+                1,
+                1,
+                WHISPER_SAMPLE_RATE,
+                WHISPER_SAMPLE_RATE * 2,
+                2,
+                16,
+                b"data",
+                data_size,
+            )
+        )
+        data.seek(0)
+        audio.on_format(self.encoding)
+
+
+def _resolve_username(user_id: int) -> str:
+    """Display name for a recorded user, or "User <id>" if not in the bot's cache."""
+    assert bot is not None
+    user_obj = bot.get_user(user_id)
+    return user_obj.display_name if user_obj else f"User {user_id}"
+
+
+def _transcribe(audio: np.ndarray) -> list[tuple[float, str]]:
+    """
+    Run Whisper on decoded 16 kHz audio; return (start, text) for each kept segment.
+    Silero VAD drops silence before the encoder runs. With TRANSCRIPT_BATCH_SIZE > 1 the batched
+    pipeline encodes the VAD chunks in batches. Segments are stripped and junk-filtered here, in the
+    worker thread, as Whisper yields them, so only the kept phrases reach the event loop.
+    """
+    if TRANSCRIPT_MIN_PEAK and audio.size:
+        peak = max(float(audio.max()), -float(audio.min())) * 32768.0
+        if peak < TRANSCRIPT_MIN_PEAK:
+            logger.debug("Skipping near-silent track (peak %.0f)", peak)
+            return []
+    if batched_model is not None:
+        segments_iter, _ = batched_model.transcribe(
+            audio, batch_size=TRANSCRIPT_BATCH_SIZE, **_TRANSCRIBE_OPTIONS
+        )
+    else:
+        segments_iter, _ = model.transcribe(audio, **_TRANSCRIBE_OPTIONS)
+    phrases = []
+    for seg in segments_iter:
+        text = (seg.text or "").strip()
+        if not is_junk_text(text):
+            phrases.append((seg.start, text))
+    return phrases
+
+
 async def once_done(sink: discord.sinks, channel: discord.TextChannel, *args) -> None:
     """
     Process recorded audio: transcribe with Whisper, save WAV and transcript to recordings,
@@ -575,90 +1106,84 @@ async def once_done(sink: discord.sinks, channel: discord.TextChannel, *args) ->
 
     transcribing_guilds.add(guild_id)
     logger.debug("Added guild %s to transcribing_guilds", guild_id)
+    _log_memory("session_start")
     status_msg = await channel.send("⚙️ **Watson is processing audio...**")
 
-    all_phrases = []
-    junk_phrases = TRANSCRIPT_JUNK_PHRASES
-    temp_files = []
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    safe_guild = "".join(
-        c if c.isalnum() or c in ("-", "_") else "_" for c in guild_name
+    track_phrases = []
+    tracks = []
+    recording_paths = []
+    started = time.gmtime()
+    timestamp = time.strftime("%Y%m%d_%H%M%S", started)
+    file_prefix = (
+        f"{timestamp}-{safe_filename_part(guild_name)}-{safe_filename_part(channel.name)}"
     )
-    safe_channel = "".join(
-        c if c.isalnum() or c in ("-", "_") else "_" for c in channel.name
-    )
-    temp_guild_dir = os.path.join(_watson_temp_dir, str(guild_id))
-    os.makedirs(temp_guild_dir, exist_ok=True)
 
     try:
         for user_id, audio in sink.audio_data.items():
-            temp_path = os.path.join(temp_guild_dir, f"temp_{user_id}.wav")
-
-            audio.file.seek(0)
-            data = audio.file.read()
-            data_len = len(data)
+            data = audio.file.getbuffer()
+            data_len = data.nbytes
 
-            if data_len < 2000:
+            duration = wav_duration_seconds(data)
+            if duration < TRANSCRIPT_MIN_SECONDS:
                 logger.debug(
-                    "Skipping user %s: audio too short (%d bytes)", user_id, data_len
+                    "Skipping user %s: audio too short (%.2f s, %d bytes)",
+                    user_id,
+                    duration,
+                    data_len,
                 )
                 continue
 
-            with open(temp_path, "wb") as f:
-                f.write(data)
-            logger.debug(
-                "Saved to temp %s (%d bytes), user %s", temp_path, data_len, user_id
-            )
-            temp_files.append((temp_path, user_id))
-            await asyncio.sleep(0)
+            tracks.append((user_id, data))
 
-            try:
+        async def _transcribe_track(data) -> list[tuple[float, str]]:
+            async with _decode_slots:
+                audio = await asyncio.to_thread(wav_to_whisper_audio, data)
+                async with _whisper_slots:
+                    return await asyncio.to_thread(_transcribe, audio)
 
-                def _transcribe(path: str):
-                    """Run Whisper on path; return list of segments."""
-                    segments_iter, _ = model.transcribe(
-                        path,
-                        beam_size=TRANSCRIPT_BEAM_SIZE,
-                        language=TRANSCRIPT_LANGUAGE,
+        usernames = {user_id: _resolve_username(user_id) for user_id, _ in tracks}
+        results = []
+        whisper_failed = False
+        if tracks:
+            try:
+                async with _whisper_in_use():
+                    results = await asyncio.gather(
+                        *(_transcribe_track(data) for _, data in tracks), return_exceptions=True
                     )
-                    return list(segments_iter)
-
-                segments_list = await asyncio.to_thread(_transcribe, temp_path)
-                await asyncio.sleep(0)
-                num_segments = len(segments_list)
-                logger.info("Transcribed user %s: %d segments", user_id, num_segments)
-
-                user_obj = bot.get_user(user_id)
-                username = user_obj.display_name if user_obj else f"User {user_id}"
-
-                for seg in segments_list:
-                    text = (seg.text or "").strip()
-                    if (
-                        not any(junk in text.lower() for junk in junk_phrases)
-                        and len(text) > 1
-                    ):
-                        all_phrases.append(
-                            {"time": seg.start, "user": username, "text": text}
-                        )
-                del segments_list
             except Exception as e:
-                logger.exception("Whisper error for user %s: %s", user_id, e)
+                logger.exception("Could not load Whisper model (guild %s): %s", guild_id, e)
+                whisper_failed = True
+                results = [e] * len(tracks)
+        for (user_id, _), result in zip(tracks, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Whisper error for user %s: %s",
+                    user_id,
+                    result,
+                    exc_info=result,
+                )
+                continue
+            logger.info("Transcribed user %s: %d phrases", user_id, len(result))
 
-        all_phrases.sort(key=lambda x: x["time"])
+            username = usernames[user_id]
+            track_phrases.append([(start, username, text) for start, text in result])
+        del results
+
+        all_phrases = list(heapq.merge(*track_phrases, key=itemgetter(0)))
+        del track_phrases
         logger.debug("Collected %d phrases", len(all_phrases))
 
-        raw_transcript = build_transcript_lines(all_phrases)
+        transcript_plain = build_transcript_lines(all_phrases, bold=False)
+        del all_phrases
 
-        if not raw_transcript:
+        if not transcript_plain and not whisper_failed:
             logger.info("No speech recognized for guild %s", guild_id)
             await status_msg.edit(content="😶 Could not recognize any speech.")
             return
 
-        transcript_plain = raw_transcript.replace("**", "")
-
         await asyncio.sleep(0)
         recap = None
-        if OLLAMA_RECAP_MODEL:
+        if OLLAMA_RECAP_MODEL and transcript_plain:
             recap = await asyncio.to_thread(
                 _get_recap_sync, transcript_plain
             )
@@ -667,47 +1192,50 @@ async def once_done(sink: discord.sinks, channel: discord.TextChannel, *args) ->
 
         transcript_saved_path = os.path.join(
             _watson_recordings_dir,
-            f"{timestamp}-{safe_guild}-{safe_channel}-transcript.txt",
+            f"{file_prefix}-transcript.txt",
         )
-        date_str = f"{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]}"
-        time_str = f"{timestamp[9:11]}:{timestamp[11:13]}:{timestamp[13:15]}"
-        transcript_header = f"{date_str} {time_str} — {guild_name} — {channel.name}"
-        file_content = transcript_header + "\n\n"
+        session_time = time.strftime("%Y-%m-%d %H:%M:%S", started)
+        transcript_header = f"{session_time} — {guild_name} — {channel.name}"
+        file_parts = [transcript_header, "\n\n"]
         if recap:
-            file_content += recap + "\n\n"
-        file_content += transcript_plain
-        try:
-            with open(transcript_saved_path, "w", encoding="utf-8") as f:
-                f.write(file_content)
-            logger.debug("Saved transcript to %s", transcript_saved_path)
-        except OSError as e:
-            logger.warning(
-                "Could not save transcript to %s: %s", transcript_saved_path, e
-            )
+            file_parts += [recap, "\n\n"]
+        file_parts.append(transcript_plain)
+        transcript_saved, *saved = await asyncio.gather(
+            asyncio.to_thread(_save_transcript, transcript_saved_path, file_parts),
+            *(
+                asyncio.to_thread(
+                    _save_recording,
+                    os.path.join(
+                        _watson_recordings_dir,
+                        f"{file_prefix}-user{user_id}.{WATSON_RECORDING_FORMAT}",
+                    ),
+                    data,
+                )
+                for user_id, data in tracks
+            ),
+        )
+        recording_paths = [p for p in saved if p is not None]
 
+        status_head = (
+            "⚠️ **Transcription failed** (Whisper model could not be loaded, see bot logs)."
+            if whisper_failed
+            else "✅ **Done.**"
+        )
         try:
-            recording_paths = []
-            for temp_path, user_id in temp_files:
-                file_name = f"{timestamp}-{safe_guild}-{safe_channel}-user{user_id}.wav"
-                dest = os.path.join(_watson_recordings_dir, file_name)
-                try:
-                    shutil.copy2(temp_path, dest)
-                    recording_paths.append(dest)
-                except OSError as e:
-                    logger.warning("Could not copy %s to %s: %s", temp_path, dest, e)
             lines = [f"- `{p}`" for p in recording_paths]
-            if os.path.exists(transcript_saved_path):
+            if transcript_saved:
                 lines.append(f"- `{transcript_saved_path}` (transcript)")
             if lines:
                 await status_msg.edit(
-                    content="✅ **Done.**\n\n"
+                    content=status_head
+                    + "\n\n"
                     + recap_block
                     + "📁 Saved to recordings:\n"
                     + "\n".join(lines)
                 )
             else:
                 await status_msg.edit(
-                    content="✅ **Done.**\n\n" + recap_block + "(no files saved)"
+                    content=status_head + "\n\n" + recap_block + "(no files saved)"
                 )
         except discord.DiscordException as e:
             logger.exception(
@@ -723,21 +1251,47 @@ async def once_done(sink: discord.sinks, channel: discord.TextChannel, *args) ->
     finally:
         transcribing_guilds.discard(guild_id)
         logger.debug("Removed guild %s from transcribing_guilds", guild_id)
-        if os.path.isdir(temp_guild_dir):
-            try:
-                await asyncio.to_thread(shutil.rmtree, temp_guild_dir)
-            except OSError as e:
-                logger.warning("Could not remove temp dir %s: %s", temp_guild_dir, e)
-        del sink
-        await asyncio.to_thread(gc.collect)
+        del sink, tracks
+        if WATSON_GC_THRESHOLD_MB and (_memory_mb() or 0) > WATSON_GC_THRESHOLD_MB:
+            gc.collect(generation=1)
+        if _malloc_trim is not None:
+            await asyncio.to_thread(_malloc_trim, 0)
+        _log_memory("session_end")
         logger.info(
             "Session finished for guild %s (%s), saved %d recording(s)",
             guild_id,
             guild_name,
-            len(temp_files),
+            len(recording_paths),
         )
 
 
+class _SlashContext:
+    """
+    Lets a prefix-command handler serve a slash command: attributes come from the
+    ApplicationContext, while ctx.send replies through the deferred interaction's followup.
+    """
+
+    def __init__(self, ctx) -> None:
+        self._ctx = ctx
+
+    def __getattr__(self, name: str):
+        return getattr(self._ctx, name)
+
+    async def send(self, *args, **kwargs):
+        return await self._ctx.followup.send(*args, **kwargs)
+
+
+def _slash_command(handler):
+    """Wrap a prefix handler as a slash callback that defers first, so Discord shows "thinking"."""
+
+    async def callback(ctx) -> None:
+        await ctx.defer()
+        await handler(_SlashContext(ctx))
+
+    callback.__name__ = handler.__name__
+    return callback
+
+
 def _create_bot() -> commands.Bot:
     """Create and configure the bot. Must be called when the event loop is already running."""
     b = commands.Bot(command_prefix=_bot_prefix, intents=intents)
@@ -748,6 +1302,11 @@ def _create_bot() -> commands.Bot:
     b.command(name="record")(record)
     b.command(name="stop")(stop)
     b.command(name="leave")(leave)
+    # The first docstring line doubles as the slash command description.
+    for handler in (check, join, record, stop, leave):
+        b.slash_command(
+            name=handler.__name__, description=handler.__doc__.splitlines()[0]
+        )(_slash_command(handler))
     return b
 
 
@@ -0,0 +1,50 @@
+"""
+One-shot: convert a Hugging Face Whisper checkpoint to a pre-quantized CTranslate2 model on disk.
+
+Point WHISPER_MODEL at the output directory so the bot loads int8 weights directly instead of
+downloading the float model and quantizing it on every start. Needs `transformers` and `torch`
+(conversion only; the bot itself does not):
+
+    pip install transformers torch
+    python scripts/convert_model.py --model openai/whisper-large-v3-turbo \\
+        --output-dir models/whisper-large-v3-turbo-int8 --quantization int8
+"""
+
+import argparse
+import logging
+import sys
+
+from ctranslate2.converters import TransformersConverter
+
+logger = logging.getLogger(__name__)
+
+# Files faster-whisper reads next to model.bin (tokenizer and mel settings).
+_COPY_FILES = ["tokenizer.json", "preprocessor_config.json"]
+
+
+def main() -> None:
+    """Parse arguments and run the conversion."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="openai/whisper-large-v3-turbo")
+    parser.add_argument("--output-dir", default="models/whisper-large-v3-turbo-int8")
+    parser.add_argument(
+        "--quantization",
+        default="int8",
+        help="CTranslate2 weight type: int8, int8_float16, float16, ... (match WHISPER_COMPUTE_TYPE)",
+    )
+    parser.add_argument("--force", action="store_true", help="Overwrite an existing output dir")
+    args = parser.parse_args()
+
+    logger.info("Converting %s -> %s (%s)", args.model, args.output_dir, args.quantization)
+    try:
+        converter = TransformersConverter(args.model, copy_files=_COPY_FILES)
+        out = converter.convert(args.output_dir, quantization=args.quantization, force=args.force)
+    except Exception as e:
+        logger.error("Conversion failed: %s", e)
+        sys.exit(1)
+    logger.info("Done. Set WHISPER_MODEL=%s", out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,74 @@
 """
-Pytest fixtures: fake discord, faster_whisper, ollama, psutil so main can be
+Pytest fixtures: fake discord, faster_whisper, ctranslate2, ollama, psutil so main can be
 imported without real connections or model load.
 """
 
+import asyncio
+import io
 import os
 import sys
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 
+class _FakeWaveSink:
+    """Stand-in for py-cord's WaveSink storage so WhisperSink can subclass a real class."""
+
+    def __init__(self, *, filters=None):
+        self.encoding = "wav"
+        self.vc = None
+        self.audio_data = {}
+
+    def write(self, data, user):
+        if user not in self.audio_data:
+            self.audio_data[user] = MagicMock(file=io.BytesIO())
+            self.audio_data[user].write = self.audio_data[user].file.write
+        self.audio_data[user].write(data)
+
+    def cleanup(self):
+        for audio in self.audio_data.values():
+            self.format_audio(audio)
+
+
+@pytest.fixture
+def session(main_module, tmp_path, monkeypatch):
+    """
+    Run once_done on finished tracks: recordings go to tmp_path, recap is off, users are not
+    cached, and session.status_msg is the processing message once_done edits.
+    """
+    monkeypatch.setattr(main_module, "_watson_recordings_dir", str(tmp_path))
+    monkeypatch.setattr(main_module, "OLLAMA_RECAP_MODEL", None)
+    monkeypatch.setattr(main_module.bot, "get_user", lambda uid: None)
+    status_msg = MagicMock()
+    status_msg.edit = AsyncMock()
+    channel = MagicMock()
+    channel.name = "general"
+    channel.guild.id = 4242
+    channel.guild.name = "Guild"
+    channel.send = AsyncMock(return_value=status_msg)
+
+    def run(wavs: dict) -> str:
+        """Process {user_id: WAV bytes}; return the final status message text."""
+        sink = SimpleNamespace(
+            audio_data={uid: SimpleNamespace(file=io.BytesIO(w)) for uid, w in wavs.items()}
+        )
+        asyncio.run(main_module.once_done(sink, channel))
+        return status_msg.edit.call_args.kwargs["content"]
+
+    return SimpleNamespace(dir=tmp_path, guild_id=channel.guild.id, status_msg=status_msg, run=run)
+
+
 @pytest.fixture(scope="module")
 def main_module():
     """
-    Import main with Discord, faster_whisper, ollama and psutil mocked.
+    Import main with Discord, faster_whisper, ctranslate2, ollama and psutil mocked.
     No token or model required.
     """
     fake_discord = MagicMock()
     fake_discord.opus.load_opus = MagicMock()
+    fake_discord.sinks.WaveSink = _FakeWaveSink
     fake_ext = MagicMock()
     fake_commands = MagicMock()
     fake_bot = MagicMock()
@@ -28,6 +79,8 @@ def main_module():
     fake_ext.commands = fake_commands
     fake_discord.ext = fake_ext
     fake_fw = MagicMock()
+    fake_ct2 = MagicMock()
+    fake_ct2.get_cuda_device_count.return_value = 0
     fake_psutil = MagicMock()
     fake_psutil.Process.return_value.memory_info.return_value.rss = 100 * 1024 * 1024
     fake_ollama = MagicMock()
@@ -40,6 +93,7 @@ def main_module():
                 "discord.ext": fake_ext,
                 "discord.ext.commands": fake_commands,
                 "faster_whisper": fake_fw,
+                "ctranslate2": fake_ct2,
                 "ollama": fake_ollama,
                 "psutil": fake_psutil,
             },
@@ -50,6 +104,7 @@ def main_module():
                 "DISCORD_TOKEN": "test-token",
                 "LOG_LEVEL": "WARNING",
                 "WATSON_SKIP_ENV_CHECK": "1",
+                "WHISPER_WARMUP": "0",
             },
             clear=False,
         ),
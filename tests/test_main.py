@@ -1,11 +1,24 @@
 """Basic tests for Watson bot logic (helpers, config, commands with mocks)."""
 
 import asyncio
+import struct
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
+import numpy as np
 import pytest
 
 
+def _wave_sink_bytes(pcm: np.ndarray, channels: int = 2, rate: int = 48000) -> bytes:
+    """WAV as WaveSink leaves it: 44-byte header with zero data size, then PCM."""
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36, b"WAVE", b"fmt ", 16, 1, channels, rate,
+        rate * channels * 2, channels * 2, 16, b"data", 0,
+    )
+    return header + pcm.astype("<i2").tobytes()
+
+
 def test_build_transcript_lines_empty(main_module):
     """Empty phrases list yields empty string."""
     assert main_module.build_transcript_lines([]) == ""
@@ -13,21 +26,133 @@ def test_build_transcript_lines_empty(main_module):
 
 def test_build_transcript_lines_single(main_module):
     """Single phrase is formatted with timestamp and user."""
-    phrases = [{"time": 0, "user": "Alice", "text": "Hello"}]
+    phrases = [(0, "Alice", "Hello")]
     assert main_module.build_transcript_lines(phrases) == "[00:00] **Alice**: Hello\n"
+    assert main_module.build_transcript_lines(phrases, bold=False) == "[00:00] Alice: Hello\n"
 
 
 def test_build_transcript_lines_multiple(main_module):
     """Multiple phrases are formatted with timestamps."""
     phrases = [
-        {"time": 65, "user": "Bob", "text": "Minute one"},
-        {"time": 0, "user": "Alice", "text": "Start"},
+        (65.7, "Bob", "Minute one"),
+        (0, "Alice", "Start"),
     ]
     out = main_module.build_transcript_lines(phrases)
     assert "[00:00] **Alice**: Start\n" in out
     assert "[01:05] **Bob**: Minute one\n" in out
 
 
+def test_wav_to_whisper_audio_downmixes_and_resamples(main_module):
+    """48 kHz stereo WaveSink output becomes float32 mono at 16 kHz despite the zero data size."""
+    pcm = np.full((48000, 2), 16384, dtype=np.int16)
+    audio = main_module.wav_to_whisper_audio(_wave_sink_bytes(pcm))
+    assert audio.dtype == np.float32
+    assert audio.shape == (16000,)
+    assert abs(float(audio[8000]) - 0.5) < 0.01
+
+
+def test_whisper_sink_stores_16k_mono_wav(main_module):
+    """WhisperSink downmixes and resamples while writing and leaves a complete WAV header."""
+    sink = main_module.WhisperSink()
+    packet = np.full((960, 2), 16384, dtype=np.int16).tobytes()  # 20 ms at 48 kHz stereo
+    for _ in range(50):
+        sink.write(packet, 1)
+    sink.cleanup()
+    wav = sink.audio_data[1].file.getvalue()
+    channels, rate = struct.unpack_from("<HI", wav, 22)
+    (data_size,) = struct.unpack_from("<I", wav, 40)
+    assert (channels, rate) == (1, 16000)
+    assert data_size == len(wav) - 44
+    assert abs(data_size // 2 - 16000) < 100
+    audio = main_module.wav_to_whisper_audio(wav)
+    assert abs(float(audio[8000]) - 0.5) < 0.01
+
+
+def test_wav_duration_seconds_uses_header_format(main_module):
+    """Duration follows the fmt fields, so 48 kHz stereo and 16 kHz mono compare correctly."""
+    stereo = _wave_sink_bytes(np.zeros((24000, 2), dtype=np.int16))
+    mono = _wave_sink_bytes(np.zeros((8000, 1), dtype=np.int16), channels=1, rate=16000)
+    assert main_module.wav_duration_seconds(stereo) == pytest.approx(0.5)
+    assert main_module.wav_duration_seconds(mono) == pytest.approx(0.5)
+    assert main_module.wav_duration_seconds(b"") == 0.0
+
+
+def test_wav_to_whisper_audio_rejects_non_16_bit(main_module):
+    """Only 16-bit PCM is supported."""
+    wav = bytearray(_wave_sink_bytes(np.zeros((100, 2), dtype=np.int16)))
+    struct.pack_into("<H", wav, 34, 8)
+    with pytest.raises(ValueError):
+        main_module.wav_to_whisper_audio(bytes(wav))
+
+
+def test_is_junk_text(main_module):
+    """Junk phrases match case-insensitively anywhere in the text; 1-char text is junk."""
+    assert main_module.is_junk_text("Thanks for watching!")
+    assert main_module.is_junk_text("SUBTITLES by someone")
+    assert main_module.is_junk_text("x")
+    assert not main_module.is_junk_text("Let's ship it on Friday")
+
+
+def test_recap_stops_streaming_at_max_chars(main_module, monkeypatch):
+    """The recap stream is closed once RECAP_MAX_CHARS arrived and the text is trimmed."""
+    monkeypatch.setattr(main_module, "_recap_prompt_parts", ("Recap:\n", ""))
+    monkeypatch.setattr(main_module, "OLLAMA_RECAP_MODEL", "test-model")
+    consumed = []
+
+    def chunks():
+        for i in range(20):
+            consumed.append(i)
+            yield {"message": {"content": "x" * 100}}
+
+    client = MagicMock()
+    client.chat.return_value = chunks()
+    monkeypatch.setattr(main_module, "_ollama_client", client)
+
+    recap = main_module._get_recap_sync("[00:00] Alice: hi")
+
+    assert len(consumed) == 4
+    assert len(recap) == main_module.RECAP_MAX_CHARS
+    assert recap.endswith("...")
+    assert client.chat.call_args.kwargs["stream"] is True
+
+
+def test_recap_prompt_reloads_on_mtime_change(main_module, tmp_path, monkeypatch):
+    """With WATSON_RELOAD_PROMPT the cached prompt is re-read after the file changes."""
+    prompt_file = tmp_path / "recap.txt"
+    prompt_file.write_text("v1 {{TRANSCRIPT}}", encoding="utf-8")
+    monkeypatch.setattr(main_module, "_recap_prompt_file", str(prompt_file))
+    monkeypatch.setattr(main_module, "_recap_prompt_parts", ("stale", ""))
+    monkeypatch.setattr(main_module, "_recap_prompt_mtime", None)
+    monkeypatch.setattr(main_module, "WATSON_RELOAD_PROMPT", True)
+
+    assert main_module._current_recap_prompt() == ("v1 ", "")
+
+
+def test_fit_transcript_to_tokens_keeps_head_and_tail(main_module):
+    """Over-budget transcripts keep whole lines from the start and the end."""
+    lines = [f"[00:{i:02d}] User: line {i}\n" for i in range(60)]
+    transcript = "".join(lines)
+    assert main_module.fit_transcript_to_tokens(transcript, 10_000) == transcript
+    fitted = main_module.fit_transcript_to_tokens(transcript, 120)
+    assert main_module.estimate_tokens(fitted) <= 125
+    assert fitted.startswith(lines[0])
+    assert fitted.endswith(lines[-1])
+    assert "[...]" in fitted
+
+
+def test_estimate_tokens_counts_bytes(main_module):
+    """Non-ASCII text costs more tokens than the same number of ASCII characters."""
+    assert main_module.estimate_tokens("abcd" * 10) == 10
+    assert main_module.estimate_tokens("привет" * 10) > main_module.estimate_tokens("privet" * 10)
+
+
+def test_safe_filename_part_matches_isalnum_rule(main_module):
+    """Letters/digits (any script), '-' and '_' are kept; everything else becomes '_'."""
+    for name in ["My Guild!", "Общий канал #1", "a-b_c/d\\e", "日本語 chat", ""]:
+        expected = "".join(c if c.isalnum() or c in ("-", "_") else "_" for c in name)
+        assert main_module.safe_filename_part(name) == expected
+
+
 def test_memory_mb_returns_float_or_none(main_module):
     """_memory_mb returns a non-negative float or None."""
     result = main_module._memory_mb()
@@ -95,3 +220,154 @@ def test_record_allowed_other_guild_while_one_transcribing(main_module):
         ctx.voice_client.start_recording.assert_called_once()
     finally:
         main_module.transcribing_guilds.discard(111)
+
+
+def test_slash_command_defers_and_replies_via_followup(main_module):
+    """Slash variant defers the interaction and routes the handler's ctx.send to the followup."""
+    ctx = MagicMock()
+    ctx.voice_client = None
+    ctx.defer = AsyncMock()
+    ctx.followup.send = AsyncMock()
+    ctx.send = AsyncMock()
+
+    asyncio.run(main_module._slash_command(main_module.record)(ctx))
+
+    ctx.defer.assert_awaited_once()
+    ctx.followup.send.assert_awaited_once()
+    ctx.send.assert_not_called()
+
+
+def test_once_done_merges_users_by_time(main_module, session, monkeypatch):
+    """once_done transcribes every user, merges phrases by time and saves WAVs + transcript."""
+    segments = {
+        1: [
+            SimpleNamespace(start=5.0, text=" Second "),
+            SimpleNamespace(start=6.0, text=" ."),
+            SimpleNamespace(start=70.0, text="Fourth"),
+        ],
+        2: [SimpleNamespace(start=1.0, text="First"), SimpleNamespace(start=9.0, text="Third")],
+    }
+    # Each track's constant level encodes its user id (loud enough to pass TRANSCRIPT_MIN_PEAK).
+    wavs = {
+        uid: _wave_sink_bytes(np.full((48000, 2), uid * 1000, dtype=np.int16)) for uid in segments
+    }
+
+    def fake_model_transcribe(audio, **kwargs):
+        uid = round(float(audio[len(audio) // 2]) * 32768 / 1000)
+        return iter(segments[uid]), None
+
+    monkeypatch.setattr(main_module, "batched_model", None)
+    monkeypatch.setattr(main_module.model, "transcribe", fake_model_transcribe)
+
+    status = session.run(wavs)
+
+    transcripts = list(session.dir.glob("*-transcript.txt"))
+    assert len(transcripts) == 1
+    body = transcripts[0].read_text(encoding="utf-8")
+    assert body.index("User 2: First") < body.index("User 1: Second")
+    assert body.index("User 1: Second") < body.index("User 2: Third")
+    assert "[01:10] User 1: Fourth" in body
+    assert "[00:06]" not in body
+    assert len(list(session.dir.glob("*.wav"))) == 2
+    assert not list(session.dir.glob("*.part"))
+    assert "Done" in status
+    assert session.guild_id not in main_module.transcribing_guilds
+
+
+def test_whisper_model_loaded_on_use_and_unloaded_when_idle(main_module, monkeypatch):
+    """With WHISPER_IDLE_UNLOAD_SECONDS the model is loaded for a session and freed after it."""
+    monkeypatch.setattr(main_module, "WHISPER_IDLE_UNLOAD_SECONDS", 0.01)
+    monkeypatch.setattr(main_module, "model", None)
+    monkeypatch.setattr(main_module, "batched_model", None)
+
+    async def run():
+        async with main_module._whisper_in_use():
+            assert main_module.model is not None
+        assert main_module.model is not None
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert main_module.model is None
+
+
+def test_once_done_does_not_load_model_without_tracks(main_module, session, monkeypatch):
+    """When every track is under TRANSCRIPT_MIN_SECONDS, a lazily loaded model stays unloaded."""
+    monkeypatch.setattr(main_module, "WHISPER_IDLE_UNLOAD_SECONDS", 60)
+    monkeypatch.setattr(main_module, "model", None)
+    monkeypatch.setattr(main_module, "batched_model", None)
+
+    status = session.run({1: _wave_sink_bytes(np.full((480, 2), 1000, dtype=np.int16))})
+
+    assert main_module.model is None
+    assert "recognize" in status
+
+
+def test_once_done_saves_recordings_when_model_fails_to_load(main_module, session, monkeypatch):
+    """A Whisper load error still saves recordings and the transcript and reports the failure."""
+    monkeypatch.setattr(main_module, "WHISPER_IDLE_UNLOAD_SECONDS", 60)
+    monkeypatch.setattr(main_module, "model", None)
+    monkeypatch.setattr(main_module, "batched_model", None)
+
+    def failing_load():
+        raise RuntimeError("CUDA out of memory")
+
+    monkeypatch.setattr(main_module, "_load_whisper_model", failing_load)
+
+    status = session.run({1: _wave_sink_bytes(np.full((48000, 2), 1000, dtype=np.int16))})
+
+    assert len(list(session.dir.glob("*.wav"))) == 1
+    assert len(list(session.dir.glob("*-transcript.txt"))) == 1
+    assert "failed" in status
+    assert session.guild_id not in main_module.transcribing_guilds
+
+
+def test_transcribe_skips_near_silent_track(main_module, monkeypatch):
+    """A track below TRANSCRIPT_MIN_PEAK never reaches the model."""
+    fake_model = MagicMock()
+    monkeypatch.setattr(main_module, "batched_model", None)
+    monkeypatch.setattr(main_module, "model", fake_model)
+    quiet = np.full(16000, 100 / 32768, dtype=np.float32)
+    assert main_module._transcribe(quiet) == []
+    fake_model.transcribe.assert_not_called()
+
+
+def test_save_recording_as_flac(main_module, tmp_path, monkeypatch):
+    """With WATSON_RECORDING_FORMAT=flac the in-memory WAV is encoded losslessly."""
+    soundfile = pytest.importorskip("soundfile")
+    monkeypatch.setattr(main_module, "soundfile", soundfile)
+    monkeypatch.setattr(main_module, "WATSON_RECORDING_FORMAT", "flac")
+    pcm = (np.arange(1600, dtype=np.int16) % 200 - 100).reshape(-1, 1)
+    dest = str(tmp_path / "rec.flac")
+
+    saved = main_module._save_recording(dest, _wave_sink_bytes(pcm, 1, 16000))
+
+    assert saved == dest
+    data, rate = soundfile.read(dest, dtype="int16")
+    assert rate == 16000
+    assert np.array_equal(data, pcm[:, 0])
+
+
+def test_save_recording_rejects_malformed_wav(main_module, tmp_path, monkeypatch):
+    """A WAV whose header cannot be encoded to FLAC is logged and skipped, leaving no .part."""
+    monkeypatch.setattr(main_module, "soundfile", pytest.importorskip("soundfile"))
+    monkeypatch.setattr(main_module, "WATSON_RECORDING_FORMAT", "flac")
+    wav = _wave_sink_bytes(np.zeros((3, 1), dtype=np.int16), channels=2, rate=16000)
+
+    assert main_module._save_recording(str(tmp_path / "rec.flac"), wav) is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_once_done_flac_writes_no_wav(main_module, session, monkeypatch):
+    """In FLAC mode recordings/ gets only the .flac and the transcript: no WAV, no .part left."""
+    monkeypatch.setattr(main_module, "soundfile", pytest.importorskip("soundfile"))
+    monkeypatch.setattr(main_module, "WATSON_RECORDING_FORMAT", "flac")
+    monkeypatch.setattr(main_module, "batched_model", None)
+    monkeypatch.setattr(
+        main_module.model,
+        "transcribe",
+        lambda audio, **kwargs: (iter([SimpleNamespace(start=0.0, text="Hello")]), None),
+    )
+
+    session.run({7: _wave_sink_bytes(np.full((48000, 2), 1000, dtype=np.int16))})
+
+    assert sorted(p.suffix for p in session.dir.iterdir()) == [".flac", ".txt"]